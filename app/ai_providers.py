@@ -1,9 +1,10 @@
 import os
 import json
-import requests
+from typing import AsyncIterator, Optional
+import httpx
 
 class LLMClient:
-    def __init__(self):
+    def __init__(self, client: Optional[httpx.AsyncClient] = None):
         # Prefer GROQ if present; fall back to OPENAI-style vars
         groq_key = os.getenv("GROQ_API_KEY", "").strip()
         openai_key = os.getenv("OPENAI_API_KEY", "").strip()
@@ -16,29 +17,75 @@ class LLMClient:
         # Basic sanity
         self.timeout = 60
 
-    def complete(self, prompt: str):
+        # Shared keep-alive pool; the app injects its own (app.state.httpx), else created lazily
+        self.client = client
+        self._owns_client = False
+
+    def _client(self) -> httpx.AsyncClient:
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=8, max_keepalive_connections=4),
+            )
+            self._owns_client = True
+        return self.client
+
+    async def aclose(self):
+        """Close the client if this instance created it (an injected one belongs to the app)."""
+        if self._owns_client and self.client is not None:
+            await self.client.aclose()
+            self.client = None
+            self._owns_client = False
+
+    def _request_args(self, prompt: str, stream: bool = False):
+        url = f"{self.base_url}/chat/completions"
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        }
+        payload = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": "You are a helpful assistant."},
+                {"role": "user", "content": prompt},
+            ],
+            "temperature": 0.2,
+            "max_tokens": 700,  # adjust if you want longer answers
+        }
+        if stream:
+            payload["stream"] = True
+        return url, headers, json.dumps(payload)
+
+    async def acomplete(self, prompt: str):
         """Return a string from the LLM, or None to trigger extractive fallback."""
         if not self.api_key:
             return None
         try:
-            url = f"{self.base_url}/chat/completions"
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json",
-            }
-            payload = {
-                "model": self.model,
-                "messages": [
-                    {"role": "system", "content": "You are a helpful assistant."},
-                    {"role": "user", "content": prompt},
-                ],
-                "temperature": 0.2,
-                "max_tokens": 700,  # adjust if you want longer answers
-            }
-            resp = requests.post(url, headers=headers, data=json.dumps(payload), timeout=self.timeout)
+            url, headers, body = self._request_args(prompt)
+            resp = await self._client().post(url, headers=headers, content=body, timeout=self.timeout)
             resp.raise_for_status()
             data = resp.json()
             return data["choices"][0]["message"]["content"]
         except Exception as e:
             print("LLM error:", e)
             return None
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        """Yield content deltas as they arrive (SSE). Yields nothing on missing key / error."""
+        if not self.api_key:
+            return
+        try:
+            url, headers, body = self._request_args(prompt, stream=True)
+            async with self._client().stream("POST", url, headers=headers, content=body, timeout=self.timeout) as resp:
+                resp.raise_for_status()
+                async for line in resp.aiter_lines():
+                    if not line or not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                    if delta:
+                        yield delta
+        except Exception as e:
+            print("LLM stream error:", e)
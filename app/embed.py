@@ -1,32 +1,101 @@
-import os, glob, json
+import os, json
+import functools
+import hashlib
+import mmap
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any
 import numpy as np
+import torch
 from sentence_transformers import SentenceTransformer
 from pypdf import PdfReader  # <-- PDF support
 
+try:
+    import simsimd  # SIMD similarity kernels (optional)
+except ImportError:  # falls back to NumPy
+    simsimd = None
+
+try:
+    import orjson  # fast meta.json (de)serialization (optional)
+except ImportError:  # falls back to stdlib json
+    orjson = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq  # columnar metadata store (optional)
+except ImportError:  # falls back to meta.json
+    pa = pq = None
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+# RAG_ENCODER=onnx swaps the PyTorch encoder for an INT8 ONNX Runtime export (CPU)
+ENCODER = os.getenv("RAG_ENCODER", "torch").strip().lower()
+ONNX_DIR = os.getenv(
+    "RAG_ONNX_DIR", os.path.join(os.path.expanduser("~"), ".cache", "mini-rag-agent", "minilm-onnx-int8")
+)
+
+def _ingest_workers() -> int:
+    default = os.cpu_count() or 1
+    raw = os.getenv("RAG_INGEST_WORKERS", "").strip()
+    try:
+        return max(1, int(raw)) if raw else default
+    except ValueError:
+        print("ignoring invalid RAG_INGEST_WORKERS", repr(raw))
+        return default
+
+# Parallel file parsing during rebuild (1 = serial)
+INGEST_WORKERS = _ingest_workers()
+
+# Windows can't replace a file that is still mapped (rag.store keeps it open during /ingest),
+# so the index is read into RAM there; POSIX maps it and swaps files with os.replace().
+EMB_MMAP_MODE = None if os.name == "nt" else "r"
+
+# RAG_DTYPE=f16 stores embeddings.npy as float16 (half the disk/RAM); scanned natively by simsimd
+STORE_DTYPE = np.float16 if os.getenv("RAG_DTYPE", "f32").strip().lower() == "f16" else np.float32
+
+# Opt-in int8 scan: RAG_I8=1 persists/uses an int8 copy of the embeddings
+USE_I8 = os.getenv("RAG_I8", "0").strip() == "1"
+
 # ---------- loaders ----------
 
+DOC_EXTS = (".md", ".txt", ".pdf")
+TEXT_CHUNK_SIZE = 700
+PDF_CHUNK_SIZE = 900
+
+def _walk(d: str):
+    # DirEntry caches the file type from the directory read, so no extra stat per entry
+    try:
+        with os.scandir(d) as it:
+            entries = list(it)
+    except OSError:
+        return  # unreadable or vanished directory: skip it, as glob did
+    for e in entries:
+        if e.name.startswith("."):
+            continue  # hidden entries, as glob skipped them
+        if e.is_dir(follow_symlinks=False):
+            yield from _walk(e.path)
+        elif e.is_file() and e.name.lower().endswith(DOC_EXTS):
+            yield e.path
+
 def iter_files(src_dir: str):
     """Yield absolute paths for .md/.txt/.pdf under src_dir (recursively)."""
-    exts = (".md", ".txt", ".pdf")
-    for path in glob.glob(os.path.join(src_dir, "**", "*"), recursive=True):
-        if os.path.isfile(path) and path.lower().endswith(exts):
-            yield path
+    if os.path.isdir(src_dir):
+        yield from _walk(src_dir)
+
+def chunk_text(text: str, chunk_size: int) -> List[str]:
+    """Fixed-stride chunks of `text`, whitespace-stripped, empties dropped."""
+    return [c for c in (text[i : i + chunk_size].strip() for i in range(0, len(text), chunk_size)) if c]
 
-def load_text_file(path: str, chunk_size: int = 700) -> List[Dict[str, Any]]:
+def load_text_file(path: str, chunk_size: int = TEXT_CHUNK_SIZE) -> List[Dict[str, Any]]:
     docs = []
     try:
         with open(path, "r", encoding="utf-8", errors="ignore") as f:
             text = f.read()
-        for i in range(0, len(text), chunk_size):
-            chunk = text[i : i + chunk_size].strip()
-            if chunk:
-                docs.append({"path": path, "page": None, "text": chunk})
+        docs = [{"path": path, "page": None, "text": chunk} for chunk in chunk_text(text, chunk_size)]
     except Exception as e:
         print("skip text", path, e)
     return docs
 
-def load_pdf(path: str, chunk_size: int = 900) -> List[Dict[str, Any]]:
+def load_pdf(path: str, chunk_size: int = PDF_CHUNK_SIZE) -> List[Dict[str, Any]]:
     """Extract text page-by-page; sub-chunk long pages for robustness."""
     docs: List[Dict[str, Any]] = []
     try:
@@ -38,93 +107,390 @@ def load_pdf(path: str, chunk_size: int = 900) -> List[Dict[str, Any]]:
                 txt = ""
             if not txt:
                 continue
-            for i in range(0, len(txt), chunk_size):
-                piece = txt[i : i + chunk_size].strip()
-                if piece:
-                    docs.append({"path": path, "page": page_idx, "text": piece})
+            docs.extend({"path": path, "page": page_idx, "text": piece} for piece in chunk_text(txt, chunk_size))
     except Exception as e:
         print("skip pdf", path, e)
     return docs
 
+def _load_one(path: str) -> List[Dict[str, Any]]:
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".pdf":
+        return load_pdf(path, PDF_CHUNK_SIZE)
+    return load_text_file(path, TEXT_CHUNK_SIZE)
+
+def _load_files(paths: List[str]) -> List[List[Dict[str, Any]]]:
+    """Chunks per file, in `paths` order (parsed in a thread pool when enabled)."""
+    if INGEST_WORKERS > 1 and len(paths) > 1:
+        # map() keeps file order, so the index layout matches a serial build
+        with ThreadPoolExecutor(max_workers=min(INGEST_WORKERS, len(paths))) as ex:
+            return list(ex.map(_load_one, paths))
+    return [_load_one(p) for p in paths]
+
 def load_documents(src_dir: str) -> List[Dict[str, Any]]:
     docs: List[Dict[str, Any]] = []
-    for p in iter_files(src_dir):
-        ext = os.path.splitext(p)[1].lower()
-        if ext == ".pdf":
-            docs.extend(load_pdf(p))
-        else:
-            docs.extend(load_text_file(p))
+    for file_docs in _load_files(list(iter_files(src_dir))):
+        docs.extend(file_docs)
     return docs
 
+def _chunking() -> Dict[str, int]:
+    return {"text": TEXT_CHUNK_SIZE, "pdf": PDF_CHUNK_SIZE}
+
+def file_sha256(path: str) -> str:
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return hashlib.sha256(b"").hexdigest()  # empty files can't be mmapped
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            return hashlib.sha256(m).hexdigest()
+
+# ---------- similarity ----------
+
+def _dot_scores(q: np.ndarray, emb: np.ndarray) -> np.ndarray:
+    """Dot product of a (1, D) query against (N, D) rows -> (N,) float32."""
+    if simsimd is not None:
+        try:
+            return np.asarray(simsimd.cdist(q, emb, metric="dot"), dtype=np.float32)[0]
+        except Exception as e:
+            print("simsimd fallback", e)
+    return (q @ emb.T)[0].astype(np.float32, copy=False)
+
+def _aligned(arr: np.ndarray, alignment: int = 64) -> np.ndarray:
+    """C-contiguous copy of `arr` whose data pointer is `alignment`-byte aligned (AVX-512 friendly)."""
+    if arr.flags.c_contiguous and arr.ctypes.data % alignment == 0:
+        return arr
+    buf = np.empty(arr.nbytes + alignment, dtype=np.uint8)
+    offset = (-buf.ctypes.data) % alignment
+    out = buf[offset : offset + arr.nbytes].view(arr.dtype).reshape(arr.shape)
+    out[...] = arr
+    return out
+
+# Query vectors, keyed on (id(model), query). Models are looked up weakly so the cache never keeps one alive.
+_query_models: "weakref.WeakValueDictionary[int, Any]" = weakref.WeakValueDictionary()
+
+@functools.lru_cache(maxsize=512)
+def _encode_query_cached(model_id: int, query: str) -> np.ndarray:
+    q = _query_models[model_id].encode(
+        [query], normalize_embeddings=True, convert_to_numpy=True
+    ).astype("float32")  # (1, 384)
+    q.setflags(write=False)  # shared by the cache; never mutate
+    return q
+
+def _i8_scale(emb: np.ndarray) -> float:
+    """Per-matrix scale mapping max |value| onto the int8 range."""
+    peak = float(np.abs(emb).max()) if emb.size else 0.0
+    return 127.0 / peak if peak > 0 else 1.0
+
+def _quantize_i8(emb: np.ndarray, scale: float) -> np.ndarray:
+    return np.clip(np.rint(emb * scale), -127, 127).astype(np.int8)
+
+# ---------- metadata ----------
+
+META_COLUMNS = ("path", "page", "text")
+
+def _meta_table(docs: List[Dict[str, Any]]):
+    """Columnar (SoA) view of [{path,page,text}] as a pyarrow Table."""
+    return pa.table({
+        "path": pa.array([d.get("path") for d in docs], type=pa.string()),
+        "page": pa.array([d.get("page") for d in docs], type=pa.int32()),
+        "text": pa.array([d.get("text") for d in docs], type=pa.string()),
+    })
+
+# ---------- encoders ----------
+
+class OnnxEncoder:
+    """
+    INT8 ONNX Runtime MiniLM with the subset of SentenceTransformer.encode() used here.
+    Exported + dynamically quantized into `cache_dir` on first use (needs optimum[onnxruntime]).
+    """
+    QUANTIZED_FILE = "model_quantized.onnx"
+
+    def __init__(self, model_name: str, cache_dir: str, max_length: int = 256):
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        from transformers import AutoTokenizer
+
+        if not os.path.exists(os.path.join(cache_dir, self.QUANTIZED_FILE)):
+            self._export(model_name, cache_dir)
+        self.max_length = max_length  # same as the sentence-transformers config
+        self.tokenizer = AutoTokenizer.from_pretrained(cache_dir)
+        self.model = ORTModelForFeatureExtraction.from_pretrained(
+            cache_dir, file_name=self.QUANTIZED_FILE, provider="CPUExecutionProvider"
+        )
+
+    @classmethod
+    def _export(cls, model_name: str, cache_dir: str):
+        from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+        from transformers import AutoTokenizer
+
+        os.makedirs(cache_dir, exist_ok=True)
+        ORTModelForFeatureExtraction.from_pretrained(model_name, export=True).save_pretrained(cache_dir)
+        AutoTokenizer.from_pretrained(model_name).save_pretrained(cache_dir)
+        quantizer = ORTQuantizer.from_pretrained(cache_dir)
+        quantizer.quantize(  # writes model_quantized.onnx next to model.onnx
+            save_dir=cache_dir,
+            quantization_config=AutoQuantizationConfig.avx2(is_static=False, per_channel=False),
+        )
+
+    def encode(
+        self,
+        sentences: List[str],
+        batch_size: int = 32,
+        show_progress_bar: bool = False,
+        normalize_embeddings: bool = False,
+        convert_to_numpy: bool = True,
+    ) -> np.ndarray:
+        out: List[np.ndarray] = []
+        for start in range(0, len(sentences), batch_size):
+            enc = self.tokenizer(
+                list(sentences[start : start + batch_size]),
+                padding=True, truncation=True, max_length=self.max_length, return_tensors="np",
+            )
+            hidden = np.asarray(self.model(**enc).last_hidden_state, dtype=np.float32)
+            # Mean pooling over real tokens (what all-MiniLM-L6-v2 uses)
+            mask = enc["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            if normalize_embeddings:
+                pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            out.append(pooled)
+        return np.concatenate(out) if out else np.zeros((0, 384), dtype=np.float32)
+
+def _read_json(path: str) -> Any:
+    if orjson is not None:
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _write_json(path: str, obj: Any):
+    # Compact (no indent): pretty-printing is several times slower and only read by code
+    if orjson is not None:
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS))
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False)
+
 # ---------- vector store ----------
 
 class LocalVectorStore:
     """
     Minimal vector store:
-    - Embeddings saved to {index_dir}/embeddings.npy  (float32, L2-normalized)
-    - Metadata  saved to {index_dir}/meta.json       (list[ {path,page,text} ])
+    - Embeddings saved to {index_dir}/embeddings.npy  (float32 or float16 with RAG_DTYPE=f16, L2-normalized,
+                                                      memory-mapped on load)
+    - Metadata  saved to {index_dir}/meta.parquet    (columns path/page/text; needs pyarrow)
+                  or {index_dir}/meta.json       (list[ {path,page,text} ]; fallback / older indexes)
+    - With RAG_I8=1 also {index_dir}/embeddings_i8.npy + scale.json (int8 copy used for search)
+    - Manifest  saved to {index_dir}/manifest.json   ({encoder, chunking, files: {abspath -> {sha256,n_chunks,row_offset}}})
+      so rebuild() only re-encodes new/changed files.
     """
     def __init__(self, index_dir: str):
         self.index_dir = index_dir
         self.meta_path = os.path.join(index_dir, "meta.json")
+        self.meta_pq_path = os.path.join(index_dir, "meta.parquet")
         self.emb_path  = os.path.join(index_dir, "embeddings.npy")
+        self.i8_path   = os.path.join(index_dir, "embeddings_i8.npy")
+        self.scale_path = os.path.join(index_dir, "scale.json")
+        self.manifest_path = os.path.join(index_dir, "manifest.json")
         os.makedirs(index_dir, exist_ok=True)
 
-        # Small, fast, CPU-friendly model (384-dim)
-        self.model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+        # Small, fast, CPU-friendly model (384-dim); FP16 when a GPU is available
+        if ENCODER == "onnx":
+            self.device = "cpu"
+            self.model = OnnxEncoder(MODEL_NAME, ONNX_DIR)
+        else:
+            self.device = "cuda" if torch.cuda.is_available() else "cpu"
+            self.model = SentenceTransformer(MODEL_NAME, device=self.device)
+            if self.device == "cuda":
+                self.model.half()
         self.embeddings: np.ndarray | None = None   # shape (N, 384)
-        self.meta: List[Dict[str, Any]] = []
+        self.meta: List[Dict[str, Any]] = []   # or a pyarrow Table when loaded from meta.parquet
+        self.embeddings_i8: np.ndarray | None = None  # only with RAG_I8=1
+        self.scale = 1.0
+        self.manifest: Dict[str, Any] = {}
+        # Repeated queries skip the MiniLM forward pass (see _encode_query_cached)
+        _query_models[id(self.model)] = self.model
+        # A later model may reuse this id, so its cached vectors go when it does
+        weakref.finalize(self.model, _encode_query_cached.cache_clear)
         self._load()
 
     def _load(self):
-        if os.path.exists(self.emb_path) and os.path.exists(self.meta_path):
-            self.embeddings = np.load(self.emb_path)
-            with open(self.meta_path, "r", encoding="utf-8") as f:
-                self.meta = json.load(f)
+        has_pq = pq is not None and os.path.exists(self.meta_pq_path)
+        if os.path.exists(self.emb_path) and (has_pq or os.path.exists(self.meta_path)):
+            self.embeddings = self._open_embeddings()
+            if has_pq:
+                # Columns stay as Arrow buffers; rows are materialized only for top-k hits
+                self.meta = pq.read_table(self.meta_pq_path, columns=list(META_COLUMNS))
+            else:
+                self.meta = _read_json(self.meta_path)
         else:
             self.embeddings = np.zeros((0, 384), dtype=np.float32)
             self.meta = []
+        self.manifest = _read_json(self.manifest_path) if os.path.exists(self.manifest_path) else {}
+        if USE_I8:
+            self._load_i8()
 
-    def rebuild(self, src_dir: str):
-        docs = load_documents(src_dir)
-        if not docs:
-            self.embeddings = np.zeros((0, 384), dtype=np.float32)
-            self.meta = []
-            self._persist()
-            return
+    def _open_embeddings(self) -> np.ndarray:
+        # Memory-mapped (POSIX): pages are faulted in by the scan instead of read up front.
+        # .npy data is 64-byte aligned within the page-aligned map, so _aligned() is a no-op here.
+        emb = np.load(self.emb_path, mmap_mode=EMB_MMAP_MODE)
+        if emb.dtype != np.float16 or simsimd is None:
+            # float32 stays mapped (no-op cast); float16 without an f16 kernel is upcast once (still halves disk)
+            emb = emb.astype(np.float32, copy=False)
+        emb = _aligned(emb)
+        assert emb.ctypes.data % 32 == 0
+        return emb
+
+    def _load_i8(self):
+        if os.path.exists(self.i8_path) and os.path.exists(self.scale_path):
+            self.embeddings_i8 = _aligned(np.load(self.i8_path))
+            self.scale = float(_read_json(self.scale_path)["scale"])
+        if self.embeddings_i8 is None or self.embeddings_i8.shape[0] != self.embeddings.shape[0]:
+            # Missing int8 copy (index built without RAG_I8): quantize in memory
+            self.scale = _i8_scale(self.embeddings)
+            self.embeddings_i8 = _quantize_i8(self.embeddings, self.scale)
 
-        texts = [d["text"] for d in docs]
+    def _encode_texts(self, texts: List[str]) -> np.ndarray:
+        """(len(texts), 384) float32, L2-normalized, in input order."""
+        if not texts:
+            return np.zeros((0, 384), dtype=np.float32)
+        # Smart batching: encode similar lengths together to cut padding, then restore order
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
         emb = self.model.encode(
-            texts,
+            [texts[i] for i in order],
+            batch_size=256 if self.device == "cuda" else 64,
+            show_progress_bar=False,
             normalize_embeddings=True,         # L2-normalize here
             convert_to_numpy=True
-        ).astype("float32")
+        )
+        emb_out = np.empty(emb.shape, dtype=np.float32)
+        emb_out[order] = emb  # un-permute and cast to float32 in one pass
+        return emb_out
 
-        self.embeddings = emb
-        self.meta = docs
+    def _reusable_files(self) -> Dict[str, Dict[str, Any]]:
+        """Manifest entries whose rows can be copied as-is, or {} if the index doesn't match it."""
+        if self.manifest.get("encoder") != ENCODER:
+            return {}  # vectors from another encoder aren't comparable
+        if self.manifest.get("chunking") != _chunking():
+            return {}  # stored rows were cut with other chunk sizes
+        files = self.manifest.get("files", {})
+        n = self.embeddings.shape[0]
+        if sum(f["n_chunks"] for f in files.values()) != n or len(self.meta) != n:
+            return {}
+        return files
+
+    def _meta_slice(self, offset: int, n: int):
+        if isinstance(self.meta, list):
+            return self.meta[offset : offset + n]
+        return self.meta.slice(offset, n)
+
+    def rebuild(self, src_dir: str):
+        """
+        Incremental: files whose SHA-256 matches the manifest keep their rows, only new or
+        changed files are chunked + encoded, and rows of removed files are dropped.
+        """
+        _encode_query_cached.cache_clear()
+        # Absolute paths, so `--src data` and the absolute DATA_DIR of /ingest share manifest keys
+        paths = [os.path.abspath(p) for p in iter_files(src_dir)]
+        hashes = {p: file_sha256(p) for p in paths}
+        old = self._reusable_files()
+        changed = [p for p in paths if old.get(p, {}).get("sha256") != hashes[p]]
+        new_docs = dict(zip(changed, _load_files(changed)))
+        new_emb = self._encode_texts([d["text"] for p in changed for d in new_docs[p]])
+
+        n_total = sum(len(new_docs[p]) if p in new_docs else old[p]["n_chunks"] for p in paths)
+        emb_out = _aligned(np.empty((n_total, 384), dtype=np.float32))
+        meta_parts: List[Any] = []
+        files: Dict[str, Dict[str, Any]] = {}
+        row = new_row = 0
+        for p in paths:
+            if p in new_docs:
+                n = len(new_docs[p])
+                emb_out[row : row + n] = new_emb[new_row : new_row + n]
+                meta_parts.append(new_docs[p])
+                new_row += n
+            else:
+                offset, n = old[p]["row_offset"], old[p]["n_chunks"]
+                emb_out[row : row + n] = self.embeddings[offset : offset + n]
+                meta_parts.append(self._meta_slice(offset, n))
+            files[p] = {"sha256": hashes[p], "n_chunks": n, "row_offset": row}
+            row += n
+
+        self.embeddings = emb_out
+        if pa is not None:
+            tables = [m if isinstance(m, pa.Table) else _meta_table(m) for m in meta_parts]
+            self.meta = pa.concat_tables(tables).combine_chunks() if tables else _meta_table([])
+        else:
+            self.meta = [d for part in meta_parts for d in part]
+        self.manifest = {"encoder": ENCODER, "chunking": _chunking(), "files": files}
         self._persist()
+        self.embeddings = self._open_embeddings()
 
     def _persist(self):
         os.makedirs(self.index_dir, exist_ok=True)
-        np.save(self.emb_path, self.embeddings)
-        with open(self.meta_path, "w", encoding="utf-8") as f:
-            json.dump(self.meta, f, ensure_ascii=False, indent=2)
+        # Write-then-rename so readers that have the old file mapped keep a valid view
+        tmp_path = self.emb_path + ".tmp.npy"
+        np.save(tmp_path, self.embeddings.astype(STORE_DTYPE, copy=False))
+        os.replace(tmp_path, self.emb_path)
+        if pq is not None:
+            table = self.meta if isinstance(self.meta, pa.Table) else _meta_table(self.meta)
+            pq.write_table(table, self.meta_pq_path)
+            stale = self.meta_path
+        else:
+            _write_json(self.meta_path, self.meta)
+            stale = self.meta_pq_path
+        if os.path.exists(stale):
+            os.remove(stale)  # never leave two disagreeing metadata files behind
+        _write_json(self.manifest_path, self.manifest)
+        if USE_I8:
+            self.scale = _i8_scale(self.embeddings)
+            self.embeddings_i8 = _quantize_i8(self.embeddings, self.scale)
+            np.save(self.i8_path, self.embeddings_i8)
+            _write_json(self.scale_path, {"scale": self.scale})
+        else:
+            # An int8 copy from an earlier RAG_I8 build no longer matches these embeddings
+            for path in (self.i8_path, self.scale_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def _meta_row(self, i: int) -> Dict[str, Any]:
+        """Fresh {path,page,text} dict for row i (safe for the caller to extend)."""
+        if isinstance(self.meta, list):
+            src = self.meta[i]
+            return {"path": src.get("path"), "page": src.get("page"), "text": src.get("text")}
+        return {name: self.meta.column(name)[i].as_py() for name in META_COLUMNS}
+
+    def _encode_query(self, query: str) -> np.ndarray:
+        return _encode_query_cached(id(self.model), query)
+
+    def _scores(self, q: np.ndarray) -> np.ndarray:
+        """Cosine similarity of the (1, 384) query against every stored row."""
+        if self.embeddings_i8 is not None and simsimd is not None:
+            try:
+                q_i8 = _quantize_i8(q, _i8_scale(q))
+                dist = np.asarray(simsimd.cdist(q_i8, self.embeddings_i8, metric="cosine"), dtype=np.float32)[0]
+                return 1.0 - dist  # simsimd returns cosine *distance*
+            except Exception as e:
+                print("simsimd i8 fallback", e)
+        # cosine because both are normalized; float16 stores are scanned with a float16 query
+        return _dot_scores(q.astype(self.embeddings.dtype, copy=False), self.embeddings)
 
     def search(self, query: str, top_k: int = 4) -> List[Dict[str, Any]]:
         """Cosine similarity via dot product (embeddings are already normalized)."""
         if self.embeddings is None or self.embeddings.shape[0] == 0:
             return []
-        q = self.model.encode(
-            [query], normalize_embeddings=True, convert_to_numpy=True
-        ).astype("float32")  # (1, 384)
-
-        sims = (q @ self.embeddings.T)[0]  # cosine because both are normalized
-        top_idxs = np.argsort(sims)[::-1][:top_k]
+        k = min(top_k, self.embeddings.shape[0])
+        if k <= 0:
+            return []
+        q = self._encode_query(query)
+        sims = self._scores(q)
+        # O(N) partial selection, then sort only the k survivors
+        part = np.argpartition(-sims, k - 1)[:k]
+        top_idxs = part[np.argsort(-sims[part])]
+        top_scores = sims[top_idxs]
 
         out: List[Dict[str, Any]] = []
-        for i in top_idxs:
-            m = self.meta[int(i)].copy()
-            m["score"] = float(sims[int(i)])
+        for i, score in zip(top_idxs.tolist(), top_scores.tolist()):
+            m = self._meta_row(i)
+            m["score"] = score
             out.append(m)
         return out
 
@@ -1,7 +1,10 @@
 import os
+import asyncio
 import traceback
+from contextlib import asynccontextmanager
+import httpx
 from fastapi import FastAPI, Request, Form
-from fastapi.responses import HTMLResponse, JSONResponse, Response
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel
@@ -11,7 +14,20 @@ from .index.build_index import build_index_cli
 
 load_dotenv()
 
-app = FastAPI(title="Mini RAG / Chat Agent", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled keep-alive client for all LLM calls, shared with the pipeline
+    app.state.httpx = httpx.AsyncClient(timeout=60)
+    rag.llm.client = app.state.httpx
+    # Warm the greeting cache without delaying startup
+    warm = asyncio.create_task(rag.warm_smalltalk()) if rag.llm.api_key else None
+    yield
+    if warm is not None:
+        warm.cancel()
+    await rag.llm.aclose()
+    await app.state.httpx.aclose()
+
+app = FastAPI(title="Mini RAG / Chat Agent", version="1.0.0", lifespan=lifespan)
 
 # Static & templates
 app.mount(
@@ -27,6 +43,8 @@ templates = Jinja2Templates(
 INDEX_DIR = os.getenv("INDEX_DIR", os.path.join(os.path.dirname(__file__), "index", "store"))
 DATA_DIR  = os.getenv("DATA_DIR",  os.path.join(os.path.dirname(os.path.dirname(__file__)), "data"))
 rag = RAGPipeline(index_dir=INDEX_DIR)
+# One rebuild at a time: rebuild() writes fixed file names under INDEX_DIR
+_ingest_lock = asyncio.Lock()
 
 # -----------------------
 # Helpers
@@ -35,18 +53,39 @@ def _is_htmx(request: Request) -> bool:
     # HTMX sends HX-Request: true
     return request.headers.get("HX-Request", "").lower() == "true"
 
-def _bubble(role: str, html: str) -> str:
+def _bubble_open(role: str) -> str:
     is_user = (role == "user")
     align = "justify-end" if is_user else "justify-start"
     bg = "bg-indigo-600 text-white" if is_user else "bg-slate-100"
     return f"""
     <div class="flex {align}">
       <div class="max-w-[80%] rounded-xl px-3 py-2 {bg} whitespace-pre-wrap leading-relaxed">
-        {html}
+        """
+
+_BUBBLE_CLOSE = """
       </div>
     </div>
     """
 
+def _bubble(role: str, html: str) -> str:
+    return _bubble_open(role) + html + _BUBBLE_CLOSE
+
+def _source_chips(sources) -> str:
+    """Render sources as small chips (filename and optional page)."""
+    if not sources:
+        return ""
+    chips = "<div class='mt-2 flex flex-wrap gap-2 text-xs'>"
+    for s in sources:
+        page = s.get("page")
+        page_part = f"(p{page})" if page else ""
+        fname = os.path.basename(s.get("path", "")) or "unknown"
+        chips += (
+            f"<span class='px-2 py-1 rounded bg-white border text-slate-600 font-mono'>"
+            f"{fname}{page_part}</span>"
+        )
+    chips += "</div>"
+    return chips
+
 # -----------------------
 # Routes
 # -----------------------
@@ -64,7 +103,7 @@ class AskPayload(BaseModel):
 
 @app.post("/ask")
 async def ask(payload: AskPayload):
-    answer, sources = rag.answer(payload.query, top_k=payload.top_k)
+    answer, sources = await rag.answer(payload.query, top_k=payload.top_k)
     return JSONResponse({"answer": answer, "sources": sources})
 
 @app.post("/ingest")
@@ -75,8 +114,10 @@ async def ingest(request: Request):
     - Otherwise returns JSON.
     """
     try:
-        build_index_cli(DATA_DIR, INDEX_DIR)
-        rag.reload(index_dir=INDEX_DIR)
+        # Encoding the corpus is CPU-bound; keep it off the event loop like retrieval
+        async with _ingest_lock:
+            await asyncio.to_thread(build_index_cli, DATA_DIR, INDEX_DIR)
+            await asyncio.to_thread(rag.reload, INDEX_DIR)
 
         if _is_htmx(request):
             # Nice inline status line for the page
@@ -99,7 +140,7 @@ async def ingest(request: Request):
 # --- Legacy mini form endpoint (still available if you link to it) ---
 @app.post("/_ask_htmx", response_class=HTMLResponse)
 async def ask_htmx(query: str = Form(...)):
-    answer, sources = rag.answer(query, top_k=4)
+    answer, sources = await rag.answer(query, top_k=4)
     html = "<div class='space-y-2'>"
     html += f"<div class='font-medium'>Answer</div><div class='p-3 rounded bg-gray-50 whitespace-pre-wrap'>{answer}</div>"
     if sources:
@@ -117,26 +158,23 @@ async def ask_htmx(query: str = Form(...)):
 async def chat_htmx(query: str = Form(...)):
     """
     Returns two chat bubbles (user + assistant) as an HTML snippet.
+    The assistant text is streamed as the LLM produces it; sources follow at the end.
     If anything goes wrong, we render an error bubble instead of 500.
     """
     try:
-        answer, sources = rag.answer(query, top_k=4)
-
-        # Render sources as small chips (filename and optional page)
-        chips = ""
-        if sources:
-            chips = "<div class='mt-2 flex flex-wrap gap-2 text-xs'>"
-            for s in sources:
-                page = s.get("page")
-                page_part = f"(p{page})" if page else ""
-                fname = os.path.basename(s.get("path", "")) or "unknown"
-                chips += (
-                    f"<span class='px-2 py-1 rounded bg-white border text-slate-600 font-mono'>"
-                    f"{fname}{page_part}</span>"
-                )
-            chips += "</div>"
-
-        return HTMLResponse(_bubble("user", query) + _bubble("assistant", answer + chips))
+        stream, sources = await rag.answer_stream(query, top_k=4)
+
+        async def body():
+            yield _bubble("user", query) + _bubble_open("assistant")
+            try:
+                async for delta in stream:
+                    yield delta
+                yield _source_chips(sources)
+            except Exception:
+                yield "Error:\n\n" + traceback.format_exc()
+            yield _BUBBLE_CLOSE
+
+        return StreamingResponse(body(), media_type="text/html")
     except Exception:
         err = traceback.format_exc()
         return HTMLResponse(
@@ -1,6 +1,8 @@
+import io
 import os
 import re
-from typing import List, Tuple, Dict, Any
+import asyncio
+from typing import List, Tuple, Dict, Any, AsyncIterator, Optional
 
 from .embed import LocalVectorStore
 from .ai_providers import LLMClient
@@ -42,6 +44,7 @@ Avoid repeating the previous answer. Output only the question.
 
 # -------- Settings --------
 MAX_CONTEXT_CHARS = 10000
+CONTEXT_SEPARATOR = "\n\n---\n\n"
 SMALLTALK_PATTERNS = re.compile(
     r"^\s*(hi|hello|hey|sup|yo|hola|namaste|hii+|good (morning|afternoon|evening)|"
     r"how (are|r) (you|u)|who are you|help|what can you do|thanks|thank you)\W*$",
@@ -49,15 +52,24 @@ SMALLTALK_PATTERNS = re.compile(
 )
 RETRIEVAL_CONFIDENCE_THRESHOLD = float(os.getenv("RAG_CONFIDENCE_THRESHOLD", "0.12"))
 FILE_HINT_PATTERN = re.compile(r"\.(pdf|md|txt)\b|p\d+\b|\bfile:?|document\b", re.IGNORECASE)
+MODE_RE = re.compile(r"^/mode\s+(auto|docs|chat)\s*$", re.IGNORECASE)
+WORD_RE = re.compile(r"\w+")
+STEP_PREFIXES = ("how ", "steps", "procedure", "implement", "configure", "setup")
+STYLE_LIST_KWS = frozenset({"list", "types", "pros", "cons", "benefits", "drawbacks", "features"})
+NON_WORD_RE = re.compile(r"\W+")
+SMALLTALK_WARM_KEYS = ("hi", "hello", "help", "thanks")
 
 def _choose_style_tag(q: str) -> str:
     ql = (q or "").lower().strip()
-    if ql.startswith(("how ", "steps", "procedure", "implement", "configure", "setup")):
+    if ql.startswith(STEP_PREFIXES):
         return "Preferred style: numbered steps."
-    if any(kw in ql for kw in ["list", "types", "pros", "cons", "benefits", "drawbacks", "features"]):
+    if not STYLE_LIST_KWS.isdisjoint(WORD_RE.findall(ql)):
         return "Preferred style: bullet list."
     return "Preferred style: short paragraph followed by 3–6 bullets."
 
+async def _once(text: str) -> AsyncIterator[str]:
+    yield text
+
 class RAGPipeline:
     """
     Modes:
@@ -72,6 +84,8 @@ class RAGPipeline:
         self.llm = LLMClient()
         self.allow_general_chat = allow_general_chat
         self._mode = "auto"
+        # Greeting guide text is near-identical per trigger; memoized by normalized smalltalk key
+        self._smalltalk_cache: Dict[str, str] = {}
 
     # ---- Mode controls ----
     def set_mode(self, mode: str):
@@ -87,8 +101,24 @@ class RAGPipeline:
     def _is_smalltalk(self, query: str) -> bool:
         return bool(SMALLTALK_PATTERNS.match(query or ""))
 
+    async def _smalltalk_guide(self, query: str) -> str:
+        key = NON_WORD_RE.sub("", (query or "").lower())[:20]
+        cached = self._smalltalk_cache.get(key)
+        if cached is not None:
+            return cached
+        guide = (await self.llm.acomplete(f"{SMALLTALK_PROMPT}\n\nUser: {query}\n\nAssistant:") or "").strip()
+        if guide:  # don't pin an empty reply from a missing key / failed call
+            self._smalltalk_cache[key] = guide
+        return guide
+
+    async def warm_smalltalk(self):
+        """Pre-fill the greeting cache for the most common triggers (run in the background at startup)."""
+        for key in SMALLTALK_WARM_KEYS:
+            await self._smalltalk_guide(key)
+
     def _format_context(self, docs: List[Dict[str, Any]]) -> str:
-        parts: List[str] = []
+        # Single pass into one buffer; `total` counts everything written, separators included
+        buf = io.StringIO()
         total = 0
         for d in docs:
             name = os.path.basename(d.get("path", "")) or "unknown"
@@ -97,12 +127,16 @@ class RAGPipeline:
             chunk = (d.get("text", "") or "").strip()
             if not chunk:
                 continue
-            block = f"[{name}{page_tag}]\n{chunk}"
-            if total + len(block) > MAX_CONTEXT_CHARS and parts:
+            header = f"[{name}{page_tag}]\n"
+            sep = CONTEXT_SEPARATOR if total else ""
+            size = len(sep) + len(header) + len(chunk)
+            if total + size > MAX_CONTEXT_CHARS and total:
                 break
-            parts.append(block)
-            total += len(block)
-        return "\n\n---\n\n".join(parts)
+            buf.write(sep)
+            buf.write(header)
+            buf.write(chunk)
+            total += size
+        return buf.getvalue()
 
     def retrieve(self, query: str, top_k: int = 6) -> List[Dict[str, Any]]:
         return self.store.search(query, top_k=top_k)
@@ -118,7 +152,7 @@ class RAGPipeline:
 
     def _maybe_interpret_mode_switch(self, query: str) -> Tuple[bool, str]:
         q = (query or "").strip()
-        m = re.match(r"^/mode\s+(auto|docs|chat)\s*$", q, flags=re.IGNORECASE)
+        m = MODE_RE.match(q)
         if m:
             self.set_mode(m.group(1).lower())
             return True, ""
@@ -133,8 +167,8 @@ class RAGPipeline:
             "What would you like to do? (You can also type `/mode docs`, `/mode chat`, or `/mode auto` anytime.)"
         )
 
-    def _append_follow_up(self, user_query: str, assistant_answer: str) -> str:
-        """Ask one natural follow-up to keep the conversation flowing."""
+    async def _follow_up(self, user_query: str, assistant_answer: str) -> str:
+        """Suffix with one natural follow-up question (starts with a blank line)."""
         try:
             prompt = (
                 f"{FOLLOW_UP_PROMPT}\n\n"
@@ -142,38 +176,54 @@ class RAGPipeline:
                 f"Assistant answer:\n{assistant_answer}\n\n"
                 f"Follow-up question:"
             )
-            nxt = self.llm.complete(prompt)
+            nxt = await self.llm.acomplete(prompt)
             if nxt:
                 q = nxt.strip()
                 if 3 <= len(q) <= 180:
-                    return assistant_answer + "\n\n" + q
+                    return "\n\n" + q
         except Exception:
             pass
         # Safe fallback
-        return assistant_answer + "\n\nWould you like to continue with this, or switch modes with `/mode docs` or `/mode chat`?"
+        return "\n\nWould you like to continue with this, or switch modes with `/mode docs` or `/mode chat`?"
+
+    async def _append_follow_up(self, user_query: str, assistant_answer: str) -> str:
+        """Ask one natural follow-up to keep the conversation flowing."""
+        return assistant_answer + await self._follow_up(user_query, assistant_answer)
 
-    # ---- Main entrypoint ----
-    def answer(self, query: str, top_k: int = 6) -> Tuple[str, List[Dict[str, Any]]]:
+    def _extractive_fallback(self, docs: List[Dict[str, Any]]) -> str:
+        """Best chunk verbatim, used when no LLM key is present."""
+        best = docs[0] if docs else {}
+        text = (best.get("text", "") or "")
+        return (text[:800] + ("..." if len(text) > 800 else "")) or "No context found."
+
+    # ---- Routing ----
+    async def _plan(self, query: str, top_k: int) -> Tuple[Optional[str], str, List[Dict[str, Any]], str]:
+        """
+        Route a query. Returns (final_answer, clean_q, docs, qa_prompt):
+          - final_answer is set when the reply is already complete (commands, smalltalk, chat routes);
+          - otherwise it is None and qa_prompt is the grounded QA prompt still to be sent to the LLM.
+        """
         # Mode switch command?
         handled, clean_q = self._maybe_interpret_mode_switch(query)
         if handled:
-            return f"Switched to **{self._mode}** mode. {self._welcome_and_ask_preference()}", []
+            return f"Switched to **{self._mode}** mode. {self._welcome_and_ask_preference()}", clean_q, [], ""
 
         # No query or pure greeting → ask preference explicitly
         if not clean_q.strip() or self._is_smalltalk(clean_q):
             # Give a short help + explicit choice prompt
-            guide = self.llm.complete(f"{SMALLTALK_PROMPT}\n\nUser: {clean_q}\n\nAssistant:") or ""
-            message = (guide.strip() + "\n\n" + self._welcome_and_ask_preference()).strip()
-            return message, []
+            guide = await self._smalltalk_guide(clean_q)
+            message = (guide + "\n\n" + self._welcome_and_ask_preference()).strip()
+            return message, clean_q, [], ""
 
         # Forced general chat
         if self._mode == "chat" and self.allow_general_chat:
             prompt = f"{GENERAL_CHAT_PROMPT}\n\nUser: {clean_q}\n\nAssistant:"
-            out = self.llm.complete(prompt) or "I'm here to chat! Ask me anything."
-            return self._append_follow_up(clean_q, out.strip()), []
+            out = await self.llm.acomplete(prompt) or "I'm here to chat! Ask me anything."
+            return await self._append_follow_up(clean_q, out.strip()), clean_q, [], ""
 
         # Retrieve docs (for docs or auto)
-        docs = self.retrieve(clean_q, top_k=top_k)
+        # Encoder + scan are CPU-bound; keep them off the event loop
+        docs = await asyncio.to_thread(self.retrieve, clean_q, top_k)
         best_score = float(docs[0].get("score", 0.0)) if docs else 0.0
         context = self._format_context(docs)
 
@@ -182,7 +232,7 @@ class RAGPipeline:
             if self._mode == "docs":
                 msg = ("Your index is empty. Put PDFs/.md/.txt inside the /data folder and click “Rebuild Index”. "
                        "Then ask questions about your documents.")
-                return msg, []
+                return msg, clean_q, [], ""
             # Auto/chat fallback
             if self.allow_general_chat:
                 base = (
@@ -190,13 +240,13 @@ class RAGPipeline:
                     "Would you like **generalized chat** for now, or add files and choose **chat with documents**?"
                 )
                 prompt = f"{GENERAL_CHAT_PROMPT}\n\nUser: {clean_q}\n\nAssistant:"
-                out = self.llm.complete(prompt) or "Sure, I can help in general. What would you like to discuss?"
+                out = await self.llm.acomplete(prompt) or "Sure, I can help in general. What would you like to discuss?"
                 final = base + "\n\n" + out.strip() + "\n\n" + "Reply with `/mode chat` or `/mode docs`."
-                return final, []
+                return final, clean_q, [], ""
             else:
                 msg = ("Your index is empty. Put PDFs/.md/.txt inside the /data folder and click “Rebuild Index”. "
                        "Then ask questions about your documents.")
-                return msg, []
+                return msg, clean_q, [], ""
 
         # AUTO routing: if it doesn't obviously want docs, offer the choice and default to chat
         if self._mode == "auto" and self.allow_general_chat and not self._wants_docs(clean_q, best_score):
@@ -205,8 +255,8 @@ class RAGPipeline:
                 "You can also switch anytime with `/mode docs` or `/mode chat`."
             )
             prompt = f"{GENERAL_CHAT_PROMPT}\n\nUser: {clean_q}\n\nAssistant:"
-            out = (self.llm.complete(prompt) or "I can help in general. What would you like to explore?").strip()
-            return self._append_follow_up(clean_q, out + "\n\n" + choice), []
+            out = (await self.llm.acomplete(prompt) or "I can help in general. What would you like to explore?").strip()
+            return await self._append_follow_up(clean_q, out + "\n\n" + choice), clean_q, [], ""
 
         # Normal RAG QA (docs or auto routed to docs)
         style_tag = _choose_style_tag(clean_q)
@@ -216,12 +266,39 @@ class RAGPipeline:
             f"# Context\n{context}\n\n"
             f"# Your Answer"
         )
-        out = self.llm.complete(prompt)
+        return None, clean_q, docs, prompt
+
+    # ---- Main entrypoints ----
+    async def answer(self, query: str, top_k: int = 6) -> Tuple[str, List[Dict[str, Any]]]:
+        final, clean_q, docs, prompt = await self._plan(query, top_k)
+        if final is not None:
+            return final, docs
+
+        out = await self.llm.acomplete(prompt)
         if out is None:
             # Extractive fallback when no LLM key present
-            best = docs[0] if docs else {}
-            text = (best.get("text", "") or "")
-            ans = (text[:800] + ("..." if len(text) > 800 else "")) or "No context found."
-            return ans, docs
+            return self._extractive_fallback(docs), docs
+
+        return await self._append_follow_up(clean_q, out.strip()), docs
 
-        return self._append_follow_up(clean_q, out.strip()), docs
+    async def answer_stream(self, query: str, top_k: int = 6) -> Tuple[AsyncIterator[str], List[Dict[str, Any]]]:
+        """Like answer(), but the grounded QA reply is yielded as the LLM streams it."""
+        final, clean_q, docs, prompt = await self._plan(query, top_k)
+        if final is not None:
+            return _once(final), docs
+        return self._stream_qa(clean_q, docs, prompt), docs
+
+    async def _stream_qa(self, clean_q: str, docs: List[Dict[str, Any]], prompt: str) -> AsyncIterator[str]:
+        parts: List[str] = []
+        async for delta in self.llm.astream(prompt):
+            if not parts:
+                delta = delta.lstrip()
+                if not delta:
+                    continue
+            parts.append(delta)
+            yield delta
+        if not parts:
+            # Extractive fallback when no LLM key present
+            yield self._extractive_fallback(docs)
+            return
+        yield await self._follow_up(clean_q, "".join(parts).strip())
@@ -0,0 +1,205 @@
+import gc, os, weakref, zlib
+import numpy as np
+import pytest
+
+from app import embed
+
+
+class FakeEncoder:
+    """Deterministic bag-of-words vectors; records how many texts each encode() call got."""
+    calls = []
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def half(self):
+        pass
+
+    def encode(self, texts, normalize_embeddings=True, convert_to_numpy=True, **kwargs):
+        FakeEncoder.calls.append(len(texts))
+        out = np.zeros((len(texts), 384), dtype=np.float32)
+        for i, t in enumerate(texts):
+            for w in t.lower().split():
+                out[i, zlib.crc32(w.encode()) % 384] += 1.0
+        out += 1e-3  # keep empty texts normalizable
+        return out / np.linalg.norm(out, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def fake_encoder(monkeypatch):
+    monkeypatch.setattr(embed, "SentenceTransformer", FakeEncoder)
+    monkeypatch.setattr(embed, "ENCODER", "torch")
+    FakeEncoder.calls = []
+    return FakeEncoder
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def _corpus(src):
+    _write(os.path.join(src, "a.md"), "alpha deploy docker " * 300)
+    _write(os.path.join(src, "sub", "b.txt"), "beta troubleshooting errors " * 200)
+    _write(os.path.join(src, "c.txt"), "gamma vision roadmap " * 100)
+    _write(os.path.join(src, "empty.txt"), "")
+
+
+def _rows(store):
+    return [store._meta_row(i) for i in range(len(store.meta))]
+
+
+def test_iter_files_skips_unreadable_dirs(tmp_path, monkeypatch):
+    _corpus(str(tmp_path))
+    real_scandir = os.scandir
+
+    def scandir(path):
+        if os.path.basename(path) == "sub":
+            raise PermissionError(path)
+        return real_scandir(path)
+
+    monkeypatch.setattr(embed.os, "scandir", scandir)
+    names = sorted(os.path.basename(p) for p in embed.iter_files(str(tmp_path)))
+    assert names == ["a.md", "c.txt", "empty.txt"]
+
+
+def test_unchanged_rebuild_encodes_nothing(fake_encoder, tmp_path):
+    src, idx = str(tmp_path / "src"), str(tmp_path / "idx")
+    _corpus(src)
+    embed.LocalVectorStore(idx).rebuild(src)
+    assert sum(fake_encoder.calls) > 0
+
+    fake_encoder.calls = []
+    embed.LocalVectorStore(idx).rebuild(src)
+    assert fake_encoder.calls == []
+
+
+@pytest.mark.parametrize("with_pyarrow", [True, False])
+def test_incremental_rebuild_matches_scratch(fake_encoder, tmp_path, monkeypatch, with_pyarrow):
+    if with_pyarrow and embed.pa is None:
+        pytest.skip("pyarrow not installed")
+    if not with_pyarrow:
+        monkeypatch.setattr(embed, "pa", None)
+        monkeypatch.setattr(embed, "pq", None)
+    src = str(tmp_path / "src")
+    _corpus(src)
+    embed.LocalVectorStore(str(tmp_path / "idx")).rebuild(src)
+
+    # edit one file, remove one, add one
+    _write(os.path.join(src, "a.md"), "alpha changed content " * 150)
+    os.remove(os.path.join(src, "c.txt"))
+    _write(os.path.join(src, "d.md"), "delta fresh notes " * 120)
+
+    fake_encoder.calls = []
+    incremental = embed.LocalVectorStore(str(tmp_path / "idx"))
+    incremental.rebuild(src)
+    n_changed = len(embed.load_text_file(os.path.join(src, "a.md"))) + len(embed.load_text_file(os.path.join(src, "d.md")))
+    assert sum(fake_encoder.calls) == n_changed
+
+    scratch = embed.LocalVectorStore(str(tmp_path / "scratch"))
+    scratch.rebuild(src)
+    assert np.array_equal(np.asarray(incremental.embeddings), np.asarray(scratch.embeddings))
+    assert _rows(incremental) == _rows(scratch)
+
+    reloaded = embed.LocalVectorStore(str(tmp_path / "idx"))
+    assert _rows(reloaded) == _rows(scratch)
+    assert os.path.basename(reloaded.search("delta fresh", top_k=1)[0]["path"]) == "d.md"
+
+
+def test_relative_and_absolute_src_share_manifest(fake_encoder, tmp_path, monkeypatch):
+    _corpus(str(tmp_path / "src"))
+    monkeypatch.chdir(tmp_path)
+    embed.LocalVectorStore("idx").rebuild("src")
+
+    fake_encoder.calls = []
+    embed.LocalVectorStore("idx").rebuild(str(tmp_path / "src"))
+    assert fake_encoder.calls == []
+
+
+def test_chunk_size_change_reencodes(fake_encoder, tmp_path, monkeypatch):
+    src, idx = str(tmp_path / "src"), str(tmp_path / "idx")
+    _corpus(src)
+    embed.LocalVectorStore(idx).rebuild(src)
+
+    monkeypatch.setattr(embed, "TEXT_CHUNK_SIZE", 500)
+    fake_encoder.calls = []
+    store = embed.LocalVectorStore(idx)
+    store.rebuild(src)
+    assert sum(fake_encoder.calls) == len(store.meta)
+
+
+def test_query_cache_hits_and_frees_store(fake_encoder, tmp_path):
+    src = str(tmp_path / "src")
+    _corpus(src)
+    store = embed.LocalVectorStore(str(tmp_path / "idx"))
+    store.rebuild(src)
+
+    fake_encoder.calls = []
+    first = store.search("gamma roadmap", top_k=1)
+    assert store.search("gamma roadmap", top_k=1) == first
+    assert fake_encoder.calls == [1]
+
+    # no reference cycle: the store (and its model) go away without the cyclic GC
+    ref = weakref.ref(store)
+    gc.disable()
+    try:
+        del store
+        assert ref() is None
+    finally:
+        gc.enable()
+
+def test_i8_search_matches_float(fake_encoder, tmp_path, monkeypatch):
+    src = str(tmp_path / "src")
+    _corpus(src)
+    plain = embed.LocalVectorStore(str(tmp_path / "f32"))
+    plain.rebuild(src)
+
+    monkeypatch.setattr(embed, "USE_I8", True)
+    quant = embed.LocalVectorStore(str(tmp_path / "i8"))
+    quant.rebuild(src)
+    assert os.path.exists(quant.i8_path) and os.path.exists(quant.scale_path)
+
+    reloaded = embed.LocalVectorStore(str(tmp_path / "i8"))
+    assert reloaded.embeddings_i8.dtype == np.int8
+    expected = plain.search("beta troubleshooting", top_k=3)
+    got = reloaded.search("beta troubleshooting", top_k=3)
+    assert got[0]["path"] == expected[0]["path"]
+    assert got[0]["score"] == pytest.approx(expected[0]["score"], abs=0.02)
+
+
+def test_rebuild_without_i8_drops_stale_copy(fake_encoder, tmp_path, monkeypatch):
+    src, idx = str(tmp_path / "src"), str(tmp_path / "idx")
+    _corpus(src)
+    monkeypatch.setattr(embed, "USE_I8", True)
+    embed.LocalVectorStore(idx).rebuild(src)
+
+    # same length, so the chunk count (and row count) stays the same
+    _write(os.path.join(src, "a.md"), "zebra quanta violin " * 300)
+    monkeypatch.setattr(embed, "USE_I8", False)
+    store = embed.LocalVectorStore(idx)
+    store.rebuild(src)
+    assert not os.path.exists(store.i8_path) and not os.path.exists(store.scale_path)
+
+    monkeypatch.setattr(embed, "USE_I8", True)
+    got = embed.LocalVectorStore(idx).search("zebra quanta violin", top_k=1)
+    assert os.path.basename(got[0]["path"]) == "a.md"
+    assert got[0]["score"] == pytest.approx(1.0, abs=0.02)
+
+
+def test_f16_store_search(fake_encoder, tmp_path, monkeypatch):
+    src = str(tmp_path / "src")
+    _corpus(src)
+    plain = embed.LocalVectorStore(str(tmp_path / "f32"))
+    plain.rebuild(src)
+
+    monkeypatch.setattr(embed, "STORE_DTYPE", np.float16)
+    half = embed.LocalVectorStore(str(tmp_path / "f16"))
+    half.rebuild(src)
+    assert np.load(half.emb_path).dtype == np.float16
+
+    reloaded = embed.LocalVectorStore(str(tmp_path / "f16"))
+    expected = plain.search("gamma roadmap", top_k=3)
+    got = reloaded.search("gamma roadmap", top_k=3)
+    assert [g["path"] for g in got] == [e["path"] for e in expected]
+    assert got[0]["score"] == pytest.approx(expected[0]["score"], abs=1e-2)
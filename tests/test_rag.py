@@ -0,0 +1,113 @@
+import asyncio
+import pytest
+
+from app import rag
+from app.rag import RAGPipeline
+
+
+def _pipeline(llm=None):
+    """RAGPipeline without a vector store (the helpers under test never touch it)."""
+    p = RAGPipeline.__new__(RAGPipeline)
+    p.llm = llm
+    p._mode = "auto"
+    p._smalltalk_cache = {}
+    return p
+
+
+@pytest.mark.parametrize("q, style", [
+    ("How do I deploy?", "numbered steps"),
+    ("  Setup the index", "numbered steps"),
+    ("List the features", "bullet list"),
+    ("pros and cons of fly.io", "bullet list"),
+    ("what are the benefits?", "bullet list"),
+    ("show my playlist", "short paragraph"),      # whole words only, not substrings
+    ("directory listing of data", "short paragraph"),
+    ("", "short paragraph"),
+    (None, "short paragraph"),
+])
+def test_choose_style_tag(q, style):
+    assert style in rag._choose_style_tag(q)
+
+
+@pytest.mark.parametrize("q, mode", [
+    ("/mode docs", "docs"),
+    ("/MODE Chat  ", "Chat"),
+    ("/mode   auto", "auto"),
+    ("/mode docsx", None),
+    ("please /mode docs", None),
+    ("/mode", None),
+])
+def test_mode_re(q, mode):
+    m = rag.MODE_RE.match(q)
+    assert (m.group(1) if m else None) == mode
+
+
+DOCS = [
+    {"path": "/data/guide.pdf", "page": 3, "text": "  Deploy with fly launch.  "},
+    {"path": "/data/empty.md", "page": None, "text": "   "},
+    {"path": "/data/notes.md", "page": None, "text": "Use uvicorn locally."},
+    {"path": "", "text": "orphan chunk"},
+]
+
+
+def test_format_context_matches_joined_blocks():
+    blocks = ["[guide.pdf:p3]\nDeploy with fly launch.", "[notes.md]\nUse uvicorn locally.", "[unknown]\norphan chunk"]
+    assert _pipeline()._format_context(DOCS) == "\n\n---\n\n".join(blocks)
+    assert _pipeline()._format_context([]) == ""
+
+
+def test_format_context_keeps_first_block_over_limit(monkeypatch):
+    monkeypatch.setattr(rag, "MAX_CONTEXT_CHARS", 10)
+    assert _pipeline()._format_context(DOCS) == "[guide.pdf:p3]\nDeploy with fly launch."
+
+
+def test_format_context_counts_separators(monkeypatch):
+    first, second = "[guide.pdf:p3]\nDeploy with fly launch.", "[notes.md]\nUse uvicorn locally."
+    # both blocks fit on their own, but not once the separator is counted
+    monkeypatch.setattr(rag, "MAX_CONTEXT_CHARS", len(first) + len(second))
+    assert _pipeline()._format_context(DOCS) == first
+    monkeypatch.setattr(rag, "MAX_CONTEXT_CHARS", len(first) + len(rag.CONTEXT_SEPARATOR) + len(second))
+    assert _pipeline()._format_context(DOCS[:3]) == first + rag.CONTEXT_SEPARATOR + second
+
+
+class CountingLLM:
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.prompts = []
+
+    async def acomplete(self, prompt):
+        self.prompts.append(prompt)
+        return self.replies.pop(0)
+
+
+def test_smalltalk_guide_memoized_per_normalized_greeting():
+    llm = CountingLLM(["Hello! Add files to /data."])
+    p = _pipeline(llm)
+
+    async def run():
+        return [await p._smalltalk_guide(q) for q in ("Hi!", "hi", "  HI ")]
+
+    assert asyncio.run(run()) == ["Hello! Add files to /data."] * 3
+    assert len(llm.prompts) == 1
+
+
+@pytest.mark.parametrize("empty", ["", "   ", None])
+def test_smalltalk_guide_does_not_cache_empty_replies(empty):
+    llm = CountingLLM([empty, "Hey there!"])
+    p = _pipeline(llm)
+
+    async def run():
+        return [await p._smalltalk_guide("hello"), await p._smalltalk_guide("Hello.")]
+
+    assert asyncio.run(run()) == ["", "Hey there!"]
+    assert len(llm.prompts) == 2
+
+
+def test_warm_smalltalk_prefills_cache():
+    llm = CountingLLM([f"guide {k}" for k in rag.SMALLTALK_WARM_KEYS])
+    p = _pipeline(llm)
+    asyncio.run(p.warm_smalltalk())
+    assert len(llm.prompts) == len(rag.SMALLTALK_WARM_KEYS)
+
+    assert asyncio.run(p._smalltalk_guide("Thanks!")) == "guide thanks"
+    assert len(llm.prompts) == len(rag.SMALLTALK_WARM_KEYS)